@@ -0,0 +1,369 @@
+# daemon.py
+# Headless entry point: no tray icon, no PIL, no global hotkeys.
+# Recording is driven over a local socket using newline-delimited JSON, e.g.
+#   {"cmd": "start"}
+#   {"cmd": "stop"}                           -> transcript; add "type": true to also type it
+#   {"cmd": "transcribe", "file": "clip.wav"} -> transcribe an existing file (identical files hit the cache)
+#   {"cmd": "search", "query": "meeting"}     -> matching past transcripts
+#   {"cmd": "status"}                         -> single snapshot
+#   {"cmd": "status_stream"}                  -> one line per status change (repeated as a heartbeat) until the client disconnects
+#   {"cmd": "metrics"}
+#   {"cmd": "shutdown"}
+# Over TCP every request must also carry "token": <contents of the token file>.
+# The first line that isn't a valid (authenticated) JSON object closes the connection.
+import argparse
+import hmac
+import json
+import os
+import secrets
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+
+from app_state import AppState
+from audio_recorder import AudioRecorder
+from stt_engine import transcribe_audio_file_cached
+from transcript_history import TranscriptHistory, open_transcript_history
+
+DEFAULT_SOCKET_PATH = "voice2text.sock"
+DEFAULT_TCP_PORT = 47821
+DEFAULT_TOKEN_PATH = os.path.join(os.path.expanduser("~"), ".voice2text_daemon_token")
+STATUS_HEARTBEAT_INTERVAL = 1.0 # Seconds between repeated status lines; lets us notice closed clients
+
+
+class DaemonController:
+    """Owns the recorder/history and implements the commands exposed over IPC."""
+    def __init__(self, app_state: AppState, audio_recorder: AudioRecorder,
+                 transcript_history: TranscriptHistory | None = None):
+        self.app_state = app_state
+        self.audio_recorder = audio_recorder
+        self.transcript_history = transcript_history
+        self._session_lock = threading.Lock() # Serializes start/stop across client connections
+        self._metrics_lock = threading.Lock()
+        self._recording_started_at: float | None = None
+        self._started_at = time.time()
+        self._metrics = {
+            "commands": {},
+            "transcriptions": 0,
+            "cache_hits": 0,
+            "errors": 0,
+            "last_recording_ms": None,
+            "last_latency_ms": None,
+            "total_latency_ms": 0.0,
+        }
+
+    def count_command(self, cmd: str):
+        with self._metrics_lock:
+            self._metrics["commands"][cmd] = self._metrics["commands"].get(cmd, 0) + 1
+
+    def _count_error(self):
+        with self._metrics_lock:
+            self._metrics["errors"] += 1
+
+    def start_recording(self) -> dict:
+        with self._session_lock:
+            if self.app_state.is_recording:
+                return {"ok": False, "error": "Already recording."}
+            if not self.audio_recorder.start_recording():
+                self.app_state.update_status("Error: Failed to start recording.", is_recording=False)
+                self._count_error()
+                return {"ok": False, "error": "Failed to start recording."}
+            self._recording_started_at = time.perf_counter()
+            self.app_state.set_recording(True)
+            return {"ok": True}
+
+    def stop_and_transcribe(self, type_text: bool = False, target_window_title: str | None = None) -> dict:
+        with self._session_lock:
+            if not self.app_state.is_recording:
+                return {"ok": False, "error": "Not recording."}
+            time_stop = time.perf_counter()
+            self.app_state.set_recording(False) # is_recording=False, status="Processing..."
+            audio_file = self.audio_recorder.stop_recording()
+            recording_ms = (time_stop - self._recording_started_at) * 1000 if self._recording_started_at else None
+            self._recording_started_at = None
+
+            with self._metrics_lock:
+                self._metrics["last_recording_ms"] = recording_ms
+                self._metrics["last_latency_ms"] = None
+
+            if not audio_file:
+                self.app_state.update_status("Error: Audio processing failed (no file).", is_recording=False)
+                self._count_error()
+                return {"ok": False, "error": "Audio processing failed (no file).", "recording_ms": recording_ms}
+
+            result = self._transcribe(audio_file, type_text, target_window_title)
+
+            try:
+                if os.path.exists(audio_file):
+                    os.remove(audio_file)
+            except Exception as e_del:
+                print(f"Daemon ERROR: Could not delete temp audio file {audio_file}: {e_del}")
+
+            result["recording_ms"] = recording_ms
+            return result
+
+    def transcribe_file(self, audio_file_path: str, type_text: bool = False, target_window_title: str | None = None) -> dict:
+        """Transcribes an existing WAV file; re-submitting the same file is served from the history cache."""
+        with self._session_lock:
+            if self.app_state.is_recording:
+                return {"ok": False, "error": "Recording in progress."}
+            if not os.path.isfile(audio_file_path):
+                return {"ok": False, "error": f"Audio file not found at '{audio_file_path}'"}
+            with self._metrics_lock:
+                self._metrics["last_recording_ms"] = None
+            return self._transcribe(audio_file_path, type_text, target_window_title)
+
+    def _transcribe(self, audio_file: str, type_text: bool, target_window_title: str | None) -> dict:
+        # Caller holds self._session_lock
+        self.app_state.update_status(f"Transcribing {os.path.basename(audio_file)}...", is_recording=False)
+        time_before_stt = time.perf_counter()
+        transcribed_text, from_cache = transcribe_audio_file_cached(audio_file, self.transcript_history, target_window_title)
+        latency_ms = (time.perf_counter() - time_before_stt) * 1000
+
+        with self._metrics_lock:
+            self._metrics["last_latency_ms"] = latency_ms
+
+        if not transcribed_text or transcribed_text.lower().startswith("error:"):
+            error = transcribed_text if transcribed_text else "Transcription failed: Unknown error."
+            self.app_state.update_status(error, is_recording=False)
+            self._count_error()
+            return {"ok": False, "error": error, "latency_ms": latency_ms}
+
+        with self._metrics_lock:
+            self._metrics["transcriptions"] += 1
+            self._metrics["total_latency_ms"] += latency_ms
+            if from_cache:
+                self._metrics["cache_hits"] += 1
+
+        text = transcribed_text.strip()
+        typed = False
+        if type_text and text:
+            # Imported lazily: pyautogui needs a display and pulls in GUI dependencies.
+            from text_inserter import insert_text_at_cursor
+            typed = insert_text_at_cursor(text + " ", target_window_title)
+        self.app_state.update_status("Text inserted." if typed else "Transcription ready.", is_recording=False)
+        return {
+            "ok": True,
+            "text": text,
+            "typed": typed,
+            "from_cache": from_cache,
+            "latency_ms": latency_ms,
+        }
+
+    def search(self, query: str, limit: int = 20) -> dict:
+        if self.transcript_history is None:
+            return {"ok": False, "error": "Transcript history is disabled."}
+        return {"ok": True, "results": self.transcript_history.search(query, limit)}
+
+    def status(self) -> dict:
+        with self.app_state.lock:
+            return {
+                "status": self.app_state.status_message,
+                "is_recording": self.app_state.is_recording,
+            }
+
+    def metrics(self) -> dict:
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+            metrics["commands"] = dict(self._metrics["commands"])
+        total_latency_ms = metrics.pop("total_latency_ms")
+        metrics["avg_latency_ms"] = total_latency_ms / metrics["transcriptions"] if metrics["transcriptions"] else None
+        metrics["uptime_s"] = time.time() - self._started_at
+        if self.transcript_history is not None:
+            metrics["history_cache_hits"] = self.transcript_history.cache_hits
+            metrics["history_cache_misses"] = self.transcript_history.cache_misses
+        return metrics
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    def _send(self, payload: dict):
+        self.wfile.write((json.dumps(payload) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def _stream_status(self, controller: DaemonController, app_state: AppState):
+        last_sent = None
+        last_sent_at = 0.0
+        while not app_state.exit_requested:
+            current = controller.status()
+            now = time.perf_counter()
+            if current != last_sent or now - last_sent_at >= STATUS_HEARTBEAT_INTERVAL:
+                self._send(current) # Raises BrokenPipeError once the client has gone away
+                last_sent = current
+                last_sent_at = now
+            time.sleep(0.1)
+
+    def _read_request(self, raw_line: bytes) -> dict | None:
+        """Parses one request line; returns None if the connection should be dropped."""
+        try:
+            request = json.loads(raw_line.decode("utf-8"))
+        except (UnicodeDecodeError, ValueError) as e:
+            self._send({"ok": False, "error": f"Invalid request: {e}"})
+            return None
+        if not isinstance(request, dict):
+            self._send({"ok": False, "error": "Invalid request: expected a JSON object."})
+            return None
+        auth_token = getattr(self.server, "auth_token", None)
+        if auth_token is not None:
+            token = request.get("token")
+            if not isinstance(token, str) or not hmac.compare_digest(token, auth_token):
+                self._send({"ok": False, "error": "Invalid or missing token."})
+                return None
+        return request
+
+    def handle(self):
+        controller: DaemonController = self.server.controller
+        app_state = controller.app_state
+        for raw_line in self.rfile:
+            if not raw_line.strip():
+                continue
+            # Anything that isn't an authenticated JSON object (e.g. an HTTP request line
+            # from a browser) ends the connection rather than being skipped.
+            request = self._read_request(raw_line)
+            if request is None:
+                return
+
+            cmd = request.get("cmd")
+            controller.count_command(str(cmd))
+            type_text = request.get("type", False)
+            target_window_title = request.get("window")
+            try:
+                if not isinstance(type_text, bool):
+                    self._send({"ok": False, "error": "'type' must be a JSON boolean."})
+                elif target_window_title is not None and not isinstance(target_window_title, str):
+                    self._send({"ok": False, "error": "'window' must be a string."})
+                elif cmd == "start":
+                    self._send(controller.start_recording())
+                elif cmd == "stop":
+                    self._send(controller.stop_and_transcribe(type_text, target_window_title))
+                elif cmd == "transcribe":
+                    audio_file_path = request.get("file")
+                    if not isinstance(audio_file_path, str):
+                        self._send({"ok": False, "error": "'file' must be a path string."})
+                    else:
+                        self._send(controller.transcribe_file(audio_file_path, type_text, target_window_title))
+                elif cmd == "search":
+                    query = request.get("query")
+                    limit = request.get("limit", 20)
+                    if not isinstance(query, str) or not isinstance(limit, int) or isinstance(limit, bool):
+                        self._send({"ok": False, "error": "'query' must be a string and 'limit' an integer."})
+                    else:
+                        self._send(controller.search(query, limit))
+                elif cmd == "status":
+                    self._send(controller.status())
+                elif cmd == "status_stream":
+                    self._stream_status(controller, app_state)
+                    return
+                elif cmd == "metrics":
+                    self._send(controller.metrics())
+                elif cmd == "shutdown":
+                    self._send({"ok": True})
+                    app_state.exit_requested = True
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+                    return
+                else:
+                    self._send({"ok": False, "error": f"Unknown command: {cmd}"})
+            except (BrokenPipeError, ConnectionResetError):
+                return # Client went away (normal end of a status stream)
+
+
+def _write_token_file(token_path: str, token: str):
+    """Writes the TCP auth token to a file readable only by the current user."""
+    if os.path.exists(token_path):
+        os.remove(token_path) # O_CREAT's mode only applies to new files
+    fd = os.open(token_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(token)
+
+
+def _remove_stale_socket(socket_path: str):
+    """Removes a leftover socket file, refusing to touch regular files or a live daemon's socket."""
+    if not os.path.exists(socket_path):
+        return
+    if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+        raise RuntimeError(f"'{socket_path}' exists and is not a socket.")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except ConnectionRefusedError:
+        os.remove(socket_path) # Stale socket from a previous run
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f"Another daemon is already listening on '{socket_path}'.")
+
+
+def create_server(controller: DaemonController, socket_path: str | None = DEFAULT_SOCKET_PATH,
+                  port: int = DEFAULT_TCP_PORT, token_path: str = DEFAULT_TOKEN_PATH) -> socketserver.BaseServer:
+    """
+    Binds a Unix-domain socket when supported and requested, otherwise localhost TCP.
+    Any local process (including web pages) can reach a TCP port, so TCP requests must carry
+    a per-run token, written to `token_path`. Raises RuntimeError if the socket path is in use.
+    """
+    if socket_path and hasattr(socket, "AF_UNIX"):
+        _remove_stale_socket(socket_path)
+        server = socketserver.ThreadingUnixStreamServer(socket_path, DaemonRequestHandler)
+        os.chmod(socket_path, 0o600) # Only the current user may connect
+        server.auth_token = None
+        print(f"Daemon: Listening on unix socket '{socket_path}'")
+    else:
+        server = socketserver.ThreadingTCPServer(("127.0.0.1", port), DaemonRequestHandler)
+        server.auth_token = secrets.token_urlsafe(32)
+        try:
+            _write_token_file(token_path, server.auth_token)
+        except OSError:
+            server.server_close()
+            raise
+        print(f"Daemon: Listening on 127.0.0.1:{port} (token in '{token_path}')")
+    server.daemon_threads = True
+    server.controller = controller
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless Voice-to-Text daemon with a local IPC API.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="Unix socket path (ignored where unsupported).")
+    parser.add_argument("--tcp", action="store_true", help="Listen on localhost TCP instead of a Unix socket.")
+    parser.add_argument("--port", type=int, default=DEFAULT_TCP_PORT, help="Localhost TCP port.")
+    parser.add_argument("--token-file", default=DEFAULT_TOKEN_PATH, help="Where to write the TCP auth token.")
+    parser.add_argument("--no-history", action="store_true", help="Disable the transcript history/cache.")
+    args = parser.parse_args()
+
+    print("Starting headless Voice-to-Text daemon...")
+    app_state_instance = AppState()
+    audio_recorder_instance = AudioRecorder(temp_filename="temp_voice_input_daemon.wav")
+    transcript_history_instance = None if args.no_history else open_transcript_history(db_path="transcript_history.db")
+    controller = DaemonController(app_state_instance, audio_recorder_instance, transcript_history_instance)
+
+    socket_path = None if args.tcp else args.socket
+    try:
+        server = create_server(controller, socket_path, args.port, args.token_file)
+    except (RuntimeError, OSError) as e:
+        print(f"Daemon ERROR: Could not start IPC server: {e}")
+        if transcript_history_instance:
+            transcript_history_instance.close()
+        sys.exit(1)
+
+    if not audio_recorder_instance.open_stream(): # Pre-warm like the hotkey path does
+        app_state_instance.update_status("Error: Mic stream failed to open.", is_recording=False)
+    else:
+        app_state_instance.update_status("Idle - Listening")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nDaemon: KeyboardInterrupt received. Shutting down.")
+    finally:
+        app_state_instance.exit_requested = True
+        server.server_close()
+        if server.auth_token is None:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+        elif os.path.exists(args.token_file):
+            os.remove(args.token_file)
+        audio_recorder_instance.close_stream()
+        if transcript_history_instance:
+            transcript_history_instance.close()
+        print("Daemon: Exited.")
@@ -9,8 +9,9 @@ import winsound
 # Assuming these are in the same directory or properly pathed
 from app_state import AppState
 from audio_recorder import AudioRecorder
-from stt_engine import transcribe_audio_file
+from stt_engine import transcribe_audio_file_cached
 from text_inserter import insert_text_at_cursor
+from transcript_history import TranscriptHistory
 
 # Define the hotkey combination (Ctrl + Alt)
 # Using sets for robust detection of concurrent presses
@@ -21,11 +22,18 @@ HOTKEY_COMBINATION_PRESS = {keyboard.Key.ctrl_l, keyboard.Key.alt_l}
 # To detect release of EITHER Ctrl or Alt when the combo was active
 HOTKEY_PARTIAL_RELEASE = {keyboard.Key.ctrl_l, keyboard.Key.alt_l, keyboard.Key.ctrl_r, keyboard.Key.alt_r}
 
+# Ctrl + Shift + Insert: re-type the last transcript from history (no new recording)
+HOTKEY_REINSERT = {keyboard.Key.ctrl_l, keyboard.Key.shift_l, keyboard.Key.insert}
+TRACKED_KEYS = HOTKEY_COMBINATION_PRESS | HOTKEY_REINSERT
+
 
 class HotkeyManager:
-    def __init__(self, app_state: AppState, audio_recorder: AudioRecorder, tray_icon_ref=None):
+    def __init__(self, app_state: AppState, audio_recorder: AudioRecorder, tray_icon_ref=None,
+                 transcript_history: TranscriptHistory | None = None):
         self.app_state = app_state
         self.audio_recorder = audio_recorder
+        self.transcript_history = transcript_history
+        self._reinsert_lock = threading.Lock() # Tray thread and hotkey threads can both trigger a re-insert
         self.listener_thread: threading.Thread | None = None  # <<< INITIALIZE HERE
         self.pynput_listener: keyboard.Listener | None = None # Also good to initialize with type hint
         self.currently_pressed_keys = set()
@@ -39,16 +47,57 @@ class HotkeyManager:
         except Exception as e:
             print(f"HotkeyManager: Error in _play_start_beep_async: {e}")
 
+    def _wait_for_modifiers_release(self, timeout=2.0):
+        # Typing while Ctrl/Shift are still held would send shortcuts instead of text
+        deadline = time.perf_counter() + timeout
+        while self.currently_pressed_keys and time.perf_counter() < deadline:
+            time.sleep(0.02)
+
+    def reinsert_recent(self, count: int = 1, wait_for_release: bool = False, refocus_window: bool = False) -> bool:
+        """
+        Re-types the last `count` transcripts from history. Types into the focused window,
+        or with refocus_window=True into the window the newest transcript was dictated into
+        (needed from the tray, where the menu click has taken focus away from the editor).
+        """
+        if self.transcript_history is None:
+            print("HotkeyManager: No transcript history configured, nothing to re-insert.")
+            return False
+        if not self._reinsert_lock.acquire(blocking=False):
+            print("HotkeyManager: Re-insert already in progress.")
+            return False
+        try:
+            entries = self.transcript_history.recent(count)
+            if not entries:
+                self.app_state.update_status("History is empty, nothing to re-insert.")
+                return False
+            if wait_for_release:
+                self._wait_for_modifiers_release()
+            text_to_type = " ".join(text.strip() for text, _ in entries) + " "
+            target_window_title = entries[-1][1] if refocus_window else None
+            self.app_state.update_status(f"Re-inserting: '{text_to_type[:30].strip()}...'")
+            if insert_text_at_cursor(text_to_type, target_window_title):
+                self.app_state.update_status("Text re-inserted from history.")
+                return True
+            self.app_state.update_status("Error re-inserting text.")
+            return False
+        finally:
+            self._reinsert_lock.release()
+
     def _on_press(self, key):
         if not self.app_state.listening_enabled or self.app_state.exit_requested:
             return True 
 
-        is_left_ctrl = key == keyboard.Key.ctrl_l
-        is_left_alt = key == keyboard.Key.alt_l
-        
-        if is_left_ctrl or is_left_alt: 
+        if key in TRACKED_KEYS:
             self.currently_pressed_keys.add(key)
 
+        if HOTKEY_REINSERT.issubset(self.currently_pressed_keys) and not self._hotkey_active_and_recording:
+            print("HotkeyManager: Ctrl+Shift+Insert PRESSED, re-inserting last transcript.")
+            # Run off the listener thread so key releases keep being tracked while we wait
+            reinsert_thread = threading.Thread(target=self.reinsert_recent, kwargs={"wait_for_release": True})
+            reinsert_thread.daemon = True
+            reinsert_thread.start()
+            return True
+
         if HOTKEY_COMBINATION_PRESS.issubset(self.currently_pressed_keys):
             if not self._hotkey_active_and_recording: 
                 time_combo_confirmed = time.perf_counter()
@@ -113,7 +162,8 @@ class HotkeyManager:
 
             if audio_file:
                 self.app_state.update_status(f"Transcribing {os.path.basename(audio_file)}...", is_recording=False)
-                transcribed_text = transcribe_audio_file(audio_file) # This can be an error string or actual text
+                # Identical audio is served from history; otherwise this can be an error string or actual text
+                transcribed_text, _ = transcribe_audio_file_cached(audio_file, self.transcript_history, active_window_title_for_typing)
 
                 # Clean up temporary audio file
                 try:
@@ -200,4 +250,4 @@ class HotkeyManager:
         
         print("HotkeyManager: Closing audio stream...")
         self.audio_recorder.close_stream() # Close stream when stopping
-        print("HotkeyManager: Stopped.")
\ No newline at end of file
+        print("HotkeyManager: Stopped.")
\ No newline at end of file
@@ -9,6 +9,7 @@ from pystray import Icon as PystrayIcon, Menu as PystrayMenu, MenuItem as Pystra
 from app_state import AppState
 from audio_recorder import AudioRecorder
 from hotkey_manager import HotkeyManager
+from transcript_history import open_transcript_history
 # STT and TextInserter are used by HotkeyManager, no direct import needed here unless for other purposes
 
 # --- Globals ---
@@ -16,6 +17,7 @@ app_state_instance = AppState()
 global_pystray_icon = None # Will hold the pystray.Icon object
 audio_recorder_instance = AudioRecorder(temp_filename="temp_voice_input.wav") # Can customize filename
 hotkey_manager_instance = None # Will be initialized in main
+transcript_history_instance = open_transcript_history(db_path="transcript_history.db") # None if the DB is unusable
 
 # --- System Tray Icon Update Function ---
 # This will be run in a separate thread to periodically update the icon/tooltip
@@ -117,6 +119,14 @@ def on_toggle_listening(icon, item): # Tray menu callback
             hotkey_manager_instance.stop() # This will stop listener AND close audio stream
     print(f"System Tray: Listening toggled to {app_state_instance.listening_enabled}")
 
+def on_reinsert_last(icon, item): # Tray menu callback
+    if hotkey_manager_instance:
+        hotkey_manager_instance.reinsert_recent(1, refocus_window=True)
+
+def on_reinsert_last_three(icon, item): # Tray menu callback
+    if hotkey_manager_instance:
+        hotkey_manager_instance.reinsert_recent(3, refocus_window=True)
+
 def on_exit_app(icon_obj, item): # Tray menu callback
     print("System Tray: Exit requested by user.")
     app_state_instance.update_status("Exiting...", is_recording=False)
@@ -141,7 +151,7 @@ if __name__ == "__main__":
     if 'audio_recorder_instance' not in globals(): # Ensure it's defined if not already global
         audio_recorder_instance = AudioRecorder(temp_filename="temp_voice_input.wav")
     
-    hotkey_manager_instance = HotkeyManager(app_state_instance, audio_recorder_instance)
+    hotkey_manager_instance = HotkeyManager(app_state_instance, audio_recorder_instance, transcript_history=transcript_history_instance)
 
     # --- Define the menu FIRST ---
     menu = PystrayMenu(
@@ -152,6 +162,9 @@ if __name__ == "__main__":
             radio=True # Makes it look like a toggle
         ),
         PystrayMenu.SEPARATOR,
+        PystrayMenuItem('Re-insert Last Transcript', on_reinsert_last),
+        PystrayMenuItem('Re-insert Last 3 Transcripts', on_reinsert_last_three),
+        PystrayMenu.SEPARATOR,
         PystrayMenuItem('Exit Application', on_exit_app)
     )
 
@@ -219,4 +232,7 @@ if __name__ == "__main__":
             if tray_updater_thread.is_alive():
                  print("Main WARN: Tray updater thread did not join in time.")
 
-        print("Main: Application exited.")
\ No newline at end of file
+        if transcript_history_instance:
+            transcript_history_instance.close()
+
+        print("Main: Application exited.")
\ No newline at end of file
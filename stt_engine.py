@@ -1,6 +1,9 @@
 # stt_engine.py
 import speech_recognition as sr
 import os
+import time
+
+from transcript_history import TranscriptHistory
 
 def transcribe_audio_file(audio_file_path: str) -> str | None:
     """
@@ -40,4 +43,29 @@ def transcribe_audio_file(audio_file_path: str) -> str | None:
         return f"Error: Google Web Speech API request failed ({e}). Check internet connection."
     except Exception as e:
         print(f"STT Engine (Google) ERROR: Unexpected error during transcription: {e}")
-        return f"Error: Transcription failed unexpectedly ({e})."
\ No newline at end of file
+        return f"Error: Transcription failed unexpectedly ({e})."
+
+def transcribe_audio_file_cached(audio_file_path: str, history: TranscriptHistory | None,
+                                 target_window_title: str | None = None) -> tuple[str | None, bool]:
+    """
+    Transcribes an audio file, serving identical audio from the transcript history
+    instead of calling the STT API again. Successful transcripts are recorded in the history.
+    Returns (text or error string, served_from_cache).
+    """
+    if history is None:
+        return transcribe_audio_file(audio_file_path), False
+
+    time_start = time.perf_counter()
+    fingerprint = history.fingerprint_audio_file(audio_file_path)
+    cached_text = history.lookup(fingerprint)
+    if cached_text is not None:
+        latency_ms = (time.perf_counter() - time_start) * 1000
+        print(f"STT Engine: Served transcript from history cache in {latency_ms:.2f} ms.")
+        history.record_hit(fingerprint)
+        return cached_text, True
+
+    text = transcribe_audio_file(audio_file_path)
+    latency_ms = (time.perf_counter() - time_start) * 1000
+    if text and not text.lower().startswith("error:") and text.strip():
+        history.add(text, fingerprint, latency_ms, target_window_title)
+    return text, False
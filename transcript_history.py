@@ -0,0 +1,195 @@
+# transcript_history.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+class TranscriptHistory:
+    """
+    Keeps every transcript that was produced so it can be re-inserted later
+    without recording again. Recent transcripts live in a bounded in-memory LRU
+    keyed by audio fingerprint; everything is persisted to a local SQLite file
+    with a full-text index over the text.
+    """
+    def __init__(self, db_path="transcript_history.db", max_cache_entries=128):
+        self.db_path = db_path
+        self.max_cache_entries = max_cache_entries
+        self._cache: OrderedDict[str, str] = OrderedDict() # fingerprint -> text, most recent last
+        self._lock = threading.Lock() # sqlite connection and cache are shared by listener/tray threads
+        self._fts_enabled = False
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        try:
+            self._create_schema()
+        except sqlite3.Error:
+            self._conn.close()
+            raise
+
+    def _create_schema(self):
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS transcripts ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " created_at REAL NOT NULL,"
+                " fingerprint TEXT,"
+                " text TEXT NOT NULL,"
+                " latency_ms REAL,"
+                " target_window TEXT,"
+                " hit_count INTEGER NOT NULL DEFAULT 0,"
+                " last_used_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_transcripts_fingerprint ON transcripts(fingerprint)"
+            )
+            try:
+                self._conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS transcripts_fts "
+                    "USING fts5(text, content='transcripts', content_rowid='id')"
+                )
+                self._conn.execute(
+                    "CREATE TRIGGER IF NOT EXISTS transcripts_ai AFTER INSERT ON transcripts BEGIN "
+                    " INSERT INTO transcripts_fts(rowid, text) VALUES (new.id, new.text); "
+                    "END"
+                )
+                self._fts_enabled = True
+            except sqlite3.OperationalError as e:
+                # Some SQLite builds ship without FTS5; search() falls back to LIKE.
+                print(f"TranscriptHistory WARNING: Full-text index unavailable ({e}). Using plain search.")
+            self._conn.commit()
+
+    @staticmethod
+    def fingerprint_audio_file(audio_file_path: str) -> str | None:
+        """Returns a SHA-256 hex digest of the audio file contents, or None if unreadable."""
+        if not audio_file_path or not os.path.exists(audio_file_path):
+            return None
+        try:
+            digest = hashlib.sha256()
+            with open(audio_file_path, "rb") as f:
+                for chunk in iter(lambda: f.read(65536), b""):
+                    digest.update(chunk)
+            return digest.hexdigest()
+        except OSError as e:
+            print(f"TranscriptHistory ERROR: Could not fingerprint '{audio_file_path}': {e}")
+            return None
+
+    def _remember(self, fingerprint: str, text: str):
+        # Caller holds self._lock
+        self._cache[fingerprint] = text
+        self._cache.move_to_end(fingerprint)
+        while len(self._cache) > self.max_cache_entries:
+            self._cache.popitem(last=False)
+
+    def lookup(self, fingerprint: str | None) -> str | None:
+        """Returns the cached transcript for identical audio, checking memory then disk."""
+        if not fingerprint:
+            return None
+        with self._lock:
+            text = self._cache.get(fingerprint)
+            if text is None:
+                row = self._conn.execute(
+                    "SELECT text FROM transcripts WHERE fingerprint = ? ORDER BY id DESC LIMIT 1",
+                    (fingerprint,)
+                ).fetchone()
+                if row:
+                    text = row[0]
+            if text is None:
+                self.cache_misses += 1
+                return None
+            self._remember(fingerprint, text)
+            self.cache_hits += 1
+            return text
+
+    def add(self, text: str, fingerprint: str | None = None, latency_ms: float | None = None,
+            target_window: str | None = None):
+        """Records a successful transcript. Error strings should not be passed here."""
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT INTO transcripts (created_at, fingerprint, text, latency_ms, target_window, last_used_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (now, fingerprint, text, latency_ms, target_window, now)
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"TranscriptHistory ERROR: Could not save transcript: {e}")
+            if fingerprint:
+                self._remember(fingerprint, text)
+
+    def record_hit(self, fingerprint: str | None):
+        """Marks the stored transcript for `fingerprint` as used again instead of adding a duplicate row."""
+        if not fingerprint:
+            return
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "UPDATE transcripts SET hit_count = hit_count + 1, last_used_at = ? "
+                    "WHERE id = (SELECT MAX(id) FROM transcripts WHERE fingerprint = ?)",
+                    (time.time(), fingerprint)
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"TranscriptHistory ERROR: Could not record cache hit: {e}")
+
+    def recent(self, count: int = 1) -> list[tuple[str, str | None]]:
+        """
+        Returns the last `count` distinct transcripts as (text, target_window) pairs,
+        oldest first (ready to be re-typed in order). The window is that of the newest row with that text.
+        """
+        if count <= 0:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT t.text, t.target_window FROM transcripts t JOIN ("
+                " SELECT MAX(id) AS newest_id, MAX(last_used_at) AS used_at FROM transcripts GROUP BY text"
+                ") g ON t.id = g.newest_id "
+                "ORDER BY g.used_at DESC, g.newest_id DESC LIMIT ?",
+                (count,)
+            ).fetchall()
+        return [(row[0], row[1]) for row in reversed(rows)]
+
+    def search(self, query: str, limit: int = 20) -> list[str]:
+        """Full-text search over past transcripts, distinct texts, most recent first."""
+        if not query:
+            return []
+        with self._lock:
+            try:
+                if self._fts_enabled:
+                    # Quote as a single FTS5 phrase so user input can't hit query-syntax errors
+                    phrase = '"' + query.replace('"', '""') + '"'
+                    rows = self._conn.execute(
+                        "SELECT text FROM transcripts_fts WHERE transcripts_fts MATCH ? "
+                        "GROUP BY text ORDER BY MAX(rowid) DESC LIMIT ?",
+                        (phrase, limit)
+                    ).fetchall()
+                else:
+                    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                    rows = self._conn.execute(
+                        "SELECT text FROM transcripts WHERE text LIKE ? ESCAPE '\\' "
+                        "GROUP BY text ORDER BY MAX(id) DESC LIMIT ?",
+                        (f"%{escaped}%", limit)
+                    ).fetchall()
+            except sqlite3.Error as e:
+                print(f"TranscriptHistory ERROR: Search for '{query}' failed: {e}")
+                return []
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self._lock:
+            try:
+                self._conn.close()
+            except Exception as e:
+                print(f"TranscriptHistory ERROR closing database: {e}")
+
+
+def open_transcript_history(db_path="transcript_history.db", max_cache_entries=128) -> TranscriptHistory | None:
+    """History is optional: returns None (and logs) if the database can't be opened or initialised."""
+    try:
+        return TranscriptHistory(db_path=db_path, max_cache_entries=max_cache_entries)
+    except sqlite3.Error as e:
+        print(f"TranscriptHistory ERROR: Could not open '{db_path}' ({e}). Transcript history disabled.")
+        return None